@@ -235,8 +235,8 @@ if input("\nSave as Excel with formulas by z-value? (y/n): ").strip().lower() ==
                 ws.cell(row=r, column=i0_col_num, value=f"=N{r}*(1-EXP(-$B$1/$B$2))")
 
         if 'z' in df.columns:
-            for z_val in sorted(df['z'].unique()):
-                df_z = df[df['z'] == z_val]
+            # groupby sorts once and hands out each z-slice, instead of one boolean scan per z
+            for z_val, df_z in df.groupby('z', sort=True):
                 write_z_sheet(wb, f"z{z_val}", df_z)
         else:
             print("No 'z' column found; skipping z-specific sheets.")
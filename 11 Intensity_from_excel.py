@@ -10,6 +10,11 @@ Main Features:
    - Prompts user to select an Excel file (`.xlsx` or `.xls`).
    - Reads the `"all"` sheet, using **row 4** (index=3) as the header row 
      (i.e. data starts at row 5 in Excel).
+   - `.xlsx` files are parsed with the Rust-based calamine engine when
+     python-calamine is installed, otherwise streamed with openpyxl in
+     read-only mode; legacy `.xls` files are read with xlrd. Only the
+     coordinate and chosen intensity columns are kept, and rows without a
+     coordinate are skipped.
 
 2. Coordinate parsing:
    - Identifies the voxel coordinate column (e.g., `"Coord_p"`, `"Coord"`).
@@ -31,8 +36,8 @@ Main Features:
 
 5. Heatmap visualization:
    - Loops over all unique z-slices.
-   - Builds a full XY grid per slice (ensuring gaps are filled with NaN).
-   - Displays 2D heatmaps using Seaborn with consistent colormap scaling.
+   - Scatters all voxels once into a dense z/y/x grid (gaps are filled with NaN).
+   - Displays 2D heatmaps using `plt.imshow` with consistent colormap scaling.
    - Each slice shows only values within `[vmin, vmax]`; others appear white.
 
 6. Output:
@@ -42,10 +47,12 @@ Main Features:
 Dependencies:
 - Python standard library (`sys`, `math`, `tkinter`)
 - Third-party libraries:
-  • pandas  
+  • pandas (>= 2.2 for the calamine engine)
+  • python-calamine (optional, faster `.xlsx` reading)
+  • openpyxl
+  • xlrd (only for legacy `.xls` files)
   • numpy  
   • matplotlib  
-  • seaborn  
 
 Usage:
 - Run the script in Python.
@@ -59,14 +66,19 @@ Usage:
 
 import sys
 import math
+import importlib.util
 import pandas as pd
 import matplotlib.pyplot as plt
-import seaborn as sns
 import numpy as np
 from matplotlib.colors import ListedColormap
+from openpyxl import load_workbook
 import tkinter as tk
 from tkinter import filedialog
 
+# pandas only knows the calamine engine from 2.2 on, and it needs python-calamine
+CALAMINE_AVAILABLE = (tuple(int(part) for part in pd.__version__.split('.')[:2]) >= (2, 2)
+                      and importlib.util.find_spec('python_calamine') is not None)
+
 # --- Select Excel file ---
 root = tk.Tk()
 root.withdraw()  # Hide main window
@@ -94,32 +106,64 @@ except ValueError:
     vmax = 10.0
 # -----------------------------
 
-# Read the "all" sheet using row 4 (index 3) as the header (so data starts on row 5)
-df = pd.read_excel(excel_file, sheet_name='all', header=3)
-
-# Clean column names
-df.columns = df.columns.str.strip()
-
-print("Loaded columns:", df.columns.tolist())
+def read_all_header(path):
+    """Return the stripped header row (row 4) of the 'all' sheet."""
+    if path.lower().endswith('.xls'):
+        # openpyxl cannot open legacy .xls workbooks
+        header = pd.read_excel(path, sheet_name='all', header=3, nrows=0, engine='xlrd').columns
+        return [str(h).strip() for h in header]
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        row = next(wb['all'].iter_rows(min_row=4, max_row=4, values_only=True), ())
+    finally:
+        wb.close()
+    return ['' if h is None else str(h).strip() for h in row]
+
+
+def read_all_columns(path, header, coord_col, int_col):
+    """Load the coordinate and intensity columns of the 'all' sheet, skipping rows without a coordinate."""
+    if path.lower().endswith('.xls'):
+        # openpyxl cannot open legacy .xls workbooks
+        df = pd.read_excel(path, sheet_name='all', header=3, engine='xlrd')
+    elif CALAMINE_AVAILABLE:
+        df = pd.read_excel(path, sheet_name='all', header=3, engine='calamine')
+    else:
+        df = None  # stream the .xlsx with openpyxl below
+    if df is not None:
+        df.columns = df.columns.astype(str).str.strip()
+        return df[[coord_col, int_col]].dropna(subset=[coord_col]).copy()
+    ci = header.index(coord_col)
+    ii = header.index(int_col)
+    coords = []
+    values = []
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        # Data starts on row 5; only the two used cells of each row are kept
+        for row in wb['all'].iter_rows(min_row=5, values_only=True):
+            if row[ci] is None:
+                continue
+            coords.append(row[ci])
+            values.append(row[ii])
+    finally:
+        wb.close()
+    return pd.DataFrame({coord_col: coords, int_col: values})
+
+
+# Read the header of the "all" sheet (row 4) to pick the columns to load
+header = read_all_header(excel_file)
+
+print("Loaded columns:", header)
 
 # Find the coordinate column (e.g. 'Coord_p' or any column containing 'coord')
-coord_cols = [c for c in df.columns if 'coord' in c.lower()]
+coord_cols = [c for c in header if 'coord' in c.lower()]
 if not coord_cols:
     raise RuntimeError("No column containing 'Coord' found in 'all' sheet headers.")
 coord_col = coord_cols[0]
 print(f"Using coordinate column: '{coord_col}'")
 
-# Split coordinate into x,y,z (strip spaces)
-coords = df[coord_col].astype(str).str.strip().str.split('_', expand=True)
-if coords.shape[1] < 3:
-    raise RuntimeError(f"Coordinate values in '{coord_col}' do not split into 3 parts.")
-df['x'] = coords[0].astype(int)
-df['y'] = coords[1].astype(int)
-df['z'] = coords[2].astype(int)
-
 # Detect candidate columns
-height_cols = [c for c in df.columns if 'height' in c.lower()]
-area_cols = [c for c in df.columns if c.lower() == 'area' or 'area' in c.lower()]
+height_cols = [c for c in header if 'height' in c.lower()]
+area_cols = [c for c in header if c.lower() == 'area' or 'area' in c.lower()]
 
 print("\nDetected candidate columns:")
 print(f"  Height-like columns: {height_cols}")
@@ -162,8 +206,17 @@ else:  # default preference: Height then Area
 
 print(f"Using intensity column: '{int_col}'\n")
 
-# Prepare intensity column (numeric)
-df = df.copy()
+# Load only the coordinate and intensity columns (data starts on row 5)
+df = read_all_columns(excel_file, header, coord_col, int_col)
+
+# Split coordinate into x,y,z with a single regex pass (surrounding spaces allowed)
+coords = df[coord_col].astype(str).str.extract(r'^\s*(-?\d+)_(-?\d+)_(-?\d+)\s*$')
+if coords.isna().any().any():
+    raise RuntimeError(f"Coordinate values in '{coord_col}' do not split into 3 parts.")
+df[['x', 'y', 'z']] = coords.astype(np.int16).to_numpy()
+
+# Prepare intensity column (numeric); kept in float64 so the min/max and the
+# vmin/vmax range checks see the stored values, float32 only in the plotting grid
 df['intensity'] = pd.to_numeric(df[int_col], errors='coerce')
 
 # Compute actual min/max (ignoring NaNs)
@@ -175,14 +228,26 @@ else:
     actual_min = 0.0
     actual_max = 0.0
 
+# Powers of ten for the usual exponent range; anything outside falls back to 10.0 ** exp
+_POW10 = {e: 10.0 ** e for e in range(-15, 16)}
+
+def _magnitude(ax):
+    """Largest power of ten <= ax (ax > 0), corrected for log10 rounding at exact powers."""
+    exp = math.floor(math.log10(ax))
+    mag = _POW10.get(exp) or 10.0 ** exp
+    if mag > ax:
+        mag = _POW10.get(exp - 1) or 10.0 ** (exp - 1)
+    elif mag * 10 <= ax:
+        mag = _POW10.get(exp + 1) or 10.0 ** (exp + 1)
+    return mag
+
 def round_up_nice(x):
     """Round x up to a 'nice' number (1 significant digit: e.g. 123->200, 78->80, 0.023->0.03)."""
     if x == 0:
         return 0.0
     sign = 1 if x > 0 else -1
     ax = abs(x)
-    exp = math.floor(math.log10(ax))
-    mag = 10 ** exp
+    mag = _magnitude(ax)
     return sign * (math.ceil(ax / mag) * mag)
 
 def round_down_nice(x):
@@ -191,8 +256,7 @@ def round_down_nice(x):
         return 0.0
     sign = 1 if x > 0 else -1
     ax = abs(x)
-    exp = math.floor(math.log10(ax))
-    mag = 10 ** exp
+    mag = _magnitude(ax)
     return sign * (math.floor(ax / mag) * mag)
 
 # Adjust vmax if user set it larger than actual_max
@@ -222,12 +286,24 @@ if vmin > vmax:
 print(f"Final color limits: vmin={vmin}, vmax={vmax}")
 
 # Get unique z slices
-z_slices = sorted(df['z'].unique())
+z_slices = np.unique(df['z'].to_numpy())
 
 # For consistent axis coverage across slices, compute full x,y ranges now
 xs = np.arange(df['x'].min(), df['x'].max() + 1)
 ys = np.arange(df['y'].min(), df['y'].max() + 1)
 
+# Scatter all voxels into one dense (z, y, x) grid in a single write; missing voxels stay NaN
+zi = np.searchsorted(z_slices, df['z'].to_numpy())
+yi = df['y'].to_numpy() - ys[0]
+xi = df['x'].to_numpy() - xs[0]
+values = df['intensity'].to_numpy(dtype=np.float64)
+
+# Set values outside chosen vmin/vmax to NaN once so they render as white
+values = np.where((values < vmin) | (values > vmax), np.nan, values)
+
+grid = np.full((len(z_slices), len(ys), len(xs)), np.nan, dtype=np.float32)
+grid[zi, yi, xi] = values.astype(np.float32)
+
 # Define colormap and set NaN/masked values to white
 cmap = plt.get_cmap('viridis')
 new_colors = cmap(np.linspace(0, 1, 256))
@@ -236,35 +312,21 @@ white = (1.0, 1.0, 1.0, 1.0)
 # set_bad is supported for ListedColormap objects; NaN/masked will show as white
 new_cmap.set_bad(white)
 
-# Plot each z slice as heatmap
-for z in z_slices:
-    slice_df = df[df['z'] == z]
-
-    # Pivot to 2D grid (rows = y, cols = x)
-    intensity_grid = slice_df.pivot(index='y', columns='x', values='intensity')
-
-    # Reindex to ensure the full grid and sorted ascending axes (so row 0 is top when not inverted)
-    intensity_grid = intensity_grid.reindex(index=ys, columns=xs).sort_index(axis=0).sort_index(axis=1)
-
-    # Ensure numeric
-    intensity_grid = intensity_grid.astype(float)
-
-    # Mask values outside chosen vmin/vmax and also the NaNs
-    out_of_range_mask = (intensity_grid < vmin) | (intensity_grid > vmax) | intensity_grid.isna()
-    # Make a copy where out-of-range are set to NaN so they render as white
-    plot_data = intensity_grid.mask(out_of_range_mask)
-
+# Plot each z slice as heatmap (NaNs render white via set_bad)
+for i, z in enumerate(z_slices):
     plt.figure(figsize=(8, 6))
-    sns.heatmap(
-        plot_data,
+    # One image per slice; extent maps pixels to voxel coordinates with y=ys[0] at the top
+    im = plt.imshow(
+        grid[i],
         cmap=new_cmap,
-        cbar_kws={'label': f'{int_col}'},
-        linewidths=0.5,
         vmin=vmin,
         vmax=vmax,
-        mask=plot_data.isna(),
-        square=False
+        origin='upper',
+        interpolation='nearest',
+        aspect='auto',
+        extent=(xs[0] - 0.5, xs[-1] + 0.5, ys[-1] + 0.5, ys[0] - 0.5)
     )
+    plt.colorbar(im, label=f'{int_col}')
     plt.title(f'{int_col} Map at z = {z} (values outside [{vmin}, {vmax}] shown white)')
     plt.xlabel('x')
     plt.ylabel('y')
@@ -12,8 +12,8 @@ Workflow:
    - Rotation is applied around the Z-axis in a 3D grid of size GRID_X × GRID_Y × GRID_Z.
 3. Applies the chosen rotation to each voxel’s (x, y, z) coordinates while preserving
    the rest of the data.
-4. Prompts the user to choose a save location and writes the rotated voxel data to
-   a new `.txt` file.
+4. Prompts the user to choose a save location and streams the rotated voxel data
+   block by block to a new `.txt` file.
 
 Dependencies:
 - Python standard library (`tkinter`, `os`)
@@ -31,15 +31,75 @@ import os
 # Grid dimensions — update as needed
 GRID_X, GRID_Y, GRID_Z = 32, 32, 8
 
-def rotate_coord(x, y, z, rotation):
-    if rotation == 90:
-        return GRID_Y - 1 - y, x, z
-    elif rotation == 180:
-        return GRID_X - 1 - x, GRID_Y - 1 - y, z
-    elif rotation == 270:
-        return y, GRID_X - 1 - x, z
-    else:
-        raise ValueError("Unsupported rotation angle")
+# Rotation around the Z-axis for each supported angle; rotate_file() picks one once per run
+ROTATIONS = {
+    90: lambda x, y, z: (GRID_Y - 1 - y, x, z),
+    180: lambda x, y, z: (GRID_X - 1 - x, GRID_Y - 1 - y, z),
+    270: lambda x, y, z: (y, GRID_X - 1 - x, z),
+}
+
+def build_coord_table(rotate):
+    """Map every "X_Y_Z" string of the grid to its "X_Y_Z" string under rotate."""
+    table = {}
+    for x in range(GRID_X):
+        for y in range(GRID_Y):
+            for z in range(GRID_Z):
+                new_x, new_y, new_z = rotate(x, y, z)
+                table[f"{x}_{y}_{z}"] = f"{new_x}_{new_y}_{new_z}"
+    return table
+
+def rotate_file(input_path, output_path, rotation):
+    """Rotate every voxel block of input_path and write the result to output_path."""
+    try:
+        rotate = ROTATIONS[rotation]
+    except KeyError:
+        raise ValueError("Unsupported rotation angle") from None
+    # The grid is small, so all rotations are computed once up front and each voxel
+    # block becomes a dict lookup; coordinates outside the table are rotated directly
+    coord_table = build_coord_table(rotate)
+
+    # Parse, rotate and write block by block; only the current voxel block is held in memory
+    with open(input_path, 'r', encoding='utf-8') as f_in, \
+            open(output_path, 'w', encoding='utf-8') as f_out:
+        lines = iter(f_in)
+        line_no = 0
+        for line in lines:
+            line_no += 1
+            # Prefix check on the raw line; only indented lines need a stripped copy
+            if not (line.startswith("Coord")
+                    or (line[:1].isspace() and line.lstrip().startswith("Coord"))):
+                # Copy any unrelated line
+                f_out.write(line)
+                continue
+
+            # Start of voxel block
+            block_start = line_no
+            next_line = next(lines, '')
+            last_line = next(lines, '')
+            line_no += 2
+
+            header_line = line.strip()
+            data_line = next_line.strip()
+            end_line = last_line.strip()
+
+            parts = data_line.split('\t')
+            coord_str = parts[0]
+
+            try:
+                new_coord_str = coord_table.get(coord_str.strip())
+                if new_coord_str is None:
+                    x_str, y_str, z_str = coord_str.strip().split("_")
+                    x, y, z = int(x_str), int(y_str), int(z_str)
+                    new_x, new_y, new_z = rotate(x, y, z)
+                    new_coord_str = f"{new_x}_{new_y}_{new_z}"
+                parts[0] = new_coord_str
+                rotated_line = "\t".join(parts)
+
+                f_out.write(header_line + '\n' + rotated_line + '\n' + end_line + '\n')
+            except Exception as e:
+                print(f"Error processing line {block_start}: {e}")
+                # Keep original lines if parsing fails
+                f_out.write(line + next_line + last_line)
 
 def main():
     # GUI root
@@ -57,47 +117,11 @@ def main():
 
     # Ask for rotation angle
     rotation = simpledialog.askinteger("Rotation", "Enter rotation angle (90, 180, 270):", minvalue=90, maxvalue=270)
-    if rotation not in [90, 180, 270]:
+    if rotation not in ROTATIONS:
         print("Invalid rotation angle.")
         return
 
-    # Parse and rotate
-    with open(input_path, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-
-    output_lines = []
-    i = 0
-    while i < len(lines):
-        if lines[i].strip().startswith("Coord"):
-            # Start of voxel block
-            header_line = lines[i].strip()
-            data_line = lines[i + 1].strip()
-            end_line = lines[i + 2].strip()
-
-            parts = data_line.split('\t')
-            coord_str = parts[0]
-
-            try:
-                x_str, y_str, z_str = coord_str.strip().split("_")
-                x, y, z = int(x_str), int(y_str), int(z_str)
-                new_x, new_y, new_z = rotate_coord(x, y, z, rotation)
-                new_coord_str = f"{new_x}_{new_y}_{new_z}"
-                parts[0] = new_coord_str
-                rotated_line = "\t".join(parts)
-
-                output_lines.extend([header_line + '\n', rotated_line + '\n', end_line + '\n'])
-            except Exception as e:
-                print(f"Error processing line {i+1}: {e}")
-                # Keep original lines if parsing fails
-                output_lines.extend([lines[i], lines[i + 1], lines[i + 2]])
-
-            i += 3  # Advance to next block
-        else:
-            # Copy any unrelated line
-            output_lines.append(lines[i])
-            i += 1
-
-    # Save to new file
+    # Ask for the save location before reading so a cancelled dialog fails fast
     output_path = filedialog.asksaveasfilename(
         title="Save Rotated Output As",
         defaultextension=".txt",
@@ -106,9 +130,11 @@ def main():
     if not output_path:
         print("No output file selected.")
         return
+    if os.path.abspath(output_path) == os.path.abspath(input_path):
+        print("Output file must differ from the input file.")
+        return
 
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.writelines(output_lines)
+    rotate_file(input_path, output_path, rotation)
 
     print(f"Rotation complete. Output saved to: {output_path}")
 
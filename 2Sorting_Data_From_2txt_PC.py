@@ -47,6 +47,9 @@ Usage:
 
 
 import os
+import re
+import mmap
+from pathlib import Path
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
@@ -77,59 +80,83 @@ if not file_path2:
     exit()
 
 # --- VALIDATE FILES ---
-if not (os.path.exists(file_path1) and os.path.exists(file_path2)):
-    print("One or both .txt file paths are invalid.")
-    exit()
+for p in (file_path1, file_path2):
+    if not Path(p).is_file():
+        print(f"Invalid .txt file path: {p}")
+        exit()
 
 print(f"\nUsing files:\n1. {file_path1}\n2. {file_path2}")
 
+# Block header: a "Coord..." line at the start of the file or right after a '###' separator
+HEADER_RE = re.compile(rb'(?:\A|###)\s*(Coord[^\r\n]*)')
+# Voxel data line: "x_y_z" followed by the remaining tab-separated fields
+DATA_RE = re.compile(rb'^( *(-?\d+)_(-?\d+)_(-?\d+) *)(\t[^\r\n]*)', re.M)
 
-if not (os.path.exists(file_path1) and os.path.exists(file_path2)):
-    print("One or both .txt file paths are invalid.")
+def parse_txt_file(file_path):
+    """Parse a fitted MRSI txt file into one NumPy array per column (plus x, y, z)."""
+    local_headers = None
+    values = {}
+    xs, ys, zs = [], [], []
+    if os.path.getsize(file_path) == 0:
+        return {}, local_headers
+    # Both regexes run over the memory-mapped file; only matched lines are decoded
+    with open(file_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        for header in HEADER_RE.finditer(buf):
+            local_headers = header.group(1).decode().split('\t')
+            # Blocks may differ in their columns: a column new to this block is padded
+            # with '' for the rows read so far, and columns this block lacks get ''
+            for h in local_headers:
+                if h not in values:
+                    values[h] = [''] * len(xs)
+            positions = {h: i for i, h in enumerate(local_headers)}
+            targets = [(values[h], i) for h, i in positions.items()]
+            missing = [column for h, column in values.items() if h not in positions]
+            block_end = buf.find(b'###', header.end())
+            if block_end == -1:
+                block_end = len(buf)
+            for m in DATA_RE.finditer(buf, header.end(), block_end):
+                parts = [m.group(1).decode()] + m.group(5)[1:].decode().split('\t')
+                if len(parts) >= len(local_headers):
+                    for column, i in targets:
+                        column.append(parts[i])
+                    for column in missing:
+                        column.append('')
+                    xs.append(int(m.group(2)))
+                    ys.append(int(m.group(3)))
+                    zs.append(int(m.group(4)))
+    if local_headers is None:
+        return {}, local_headers
+    cols = {h: np.array(v) for h, v in values.items()}
+    cols.update({'x': np.array(xs), 'y': np.array(ys), 'z': np.array(zs)})
+    return cols, local_headers
+
+def sort_by_zxy(cols):
+    order = np.lexsort((cols['y'], cols['x'], cols['z']))
+    return {h: v[order] for h, v in cols.items()}
+
+def select_rows(cols, mask):
+    return {h: v[mask] for h, v in cols.items()}
+
+# Parse both files (column arrays keyed by header)
+data_cols1, headers = parse_txt_file(file_path1)
+data_cols2, _ = parse_txt_file(file_path2)
+if not data_cols1 or not data_cols2:
+    print("No voxel data found in one or both files. Exiting.")
     exit()
 
-print(f"\nUsing files:\n1. {file_path1}\n2. {file_path2}")
+sorted_data1 = sort_by_zxy(data_cols1)
+sorted_data2 = sort_by_zxy(data_cols2)
 
-def parse_txt_file(file_path):
-    with open(file_path, 'r') as file:
-        content = file.read()
-    blocks = content.strip().split('###')
-    entries = []
-    local_headers = None
-    for block in blocks:
-        lines = block.strip().split('\n')
-        if not lines or not lines[0].startswith("Coord"):
-            continue
-        local_headers = lines[0].split('\t')
-        for line in lines[1:]:
-            parts = line.split('\t')
-            if len(parts) >= len(local_headers):
-                entry = dict(zip(local_headers, parts))
-                try:
-                    x, y, z = map(int, entry['Coord'].split('_'))
-                    entry.update({'x': x, 'y': y, 'z': z})
-                    entries.append(entry)
-                except Exception:
-                    continue
-    return entries, local_headers
-
-# Parse both files
-data_entries1, headers = parse_txt_file(file_path1)
-data_entries2, _ = parse_txt_file(file_path2)
-
-sorted_data1 = sorted(data_entries1, key=lambda e: (e['z'], e['x'], e['y']))
-sorted_data2 = sorted(data_entries2, key=lambda e: (e['z'], e['x'], e['y']))
-
-metabolites = sorted({e['Metabolite'] for e in sorted_data1})
+metabolites = np.unique(sorted_data1['Metabolite'])
 print("\nAvailable Metabolites:")
 for m in metabolites:
     print(f" - {m}")
 selected = input("\nType metabolite names (comma-separated), e.g. Main: ")
 sel_set = {m.strip() for m in selected.split(',') if m.strip()}
 
-filtered1 = [e for e in sorted_data1 if e['Metabolite'] in sel_set]
-filtered2 = [e for e in sorted_data2 if e['Metabolite'] in sel_set]
-if not filtered1 or not filtered2:
+filtered1 = select_rows(sorted_data1, np.isin(sorted_data1['Metabolite'], list(sel_set)))
+filtered2 = select_rows(sorted_data2, np.isin(sorted_data2['Metabolite'], list(sel_set)))
+if not len(filtered1['Coord']) or not len(filtered2['Coord']):
     print("No matching data in one or both files. Exiting.")
     exit()
 
@@ -137,11 +164,15 @@ _df = pd.DataFrame(filtered1)
 print("\n\U0001F9BE Preview:")
 print(_df[['Coord', 'Metabolite', 'Area', 'LDamping']].head(10))
 
-main = [d for d in filtered1 if d['Metabolite'] == 'Main']
-if main:
-    dfm = pd.DataFrame(main)
-    dfm['Area'] = pd.to_numeric(dfm['Area'], errors='coerce')
-    pt = dfm.pivot_table(index='y', columns='x', values='Area', aggfunc='first')
+main = filtered1['Metabolite'] == 'Main'
+if main.any():
+    xs = filtered1['x'][main]
+    ys = filtered1['y'][main]
+    areas = pd.to_numeric(filtered1['Area'][main], errors='coerce')
+    # Scatter into a dense (y, x) grid; written in reverse so the first (lowest z) value per voxel wins
+    order = np.flatnonzero(~np.isnan(areas))[::-1]
+    pt = np.full((ys.max() - ys.min() + 1, xs.max() - xs.min() + 1), np.nan)
+    pt[ys[order] - ys.min(), xs[order] - xs.min()] = areas[order]
     plt.figure(figsize=(10, 8))
     plt.imshow(pt, origin='lower', aspect='auto', cmap='viridis')
     plt.colorbar(label='Area')
@@ -154,8 +185,8 @@ if input("\nSave as Excel with formulas by z-value? (y/n): ").strip().lower() ==
     root.withdraw()
     excel_path = filedialog.asksaveasfilename(defaultextension='.xlsx', filetypes=[('Excel files', '*.xlsx')])
     if excel_path:
-        wb = Workbook()
-        wb.remove(wb.active)
+        # Write-only workbook: rows are streamed to the file, so every sheet is emitted top to bottom in one pass
+        wb = Workbook(write_only=True)
 
         header_cols = headers + ['Height', 'FWHM', 'I0ps', 'I0']
         area_idx = header_cols.index('Area')
@@ -163,136 +194,107 @@ if input("\nSave as Excel with formulas by z-value? (y/n): ").strip().lower() ==
         h_idx = header_cols.index('Height')
         f_idx = header_cols.index('FWHM')
         i0_idx = header_cols.index('I0')
+        c_idx = i0_idx + 1  # 'c [mM]' column, inserted directly right of I0 on every sheet
 
-        def col_letter(idx): return get_column_letter(idx + 1)
+        # 0-based column index -> A1 column letter
+        COL_LETTERS = tuple(get_column_letter(i) for i in range(1, 200))
 
         df1 = pd.DataFrame(filtered1)
         df2 = pd.DataFrame(filtered2)
 
-        def extract_coord_key(coord_str):
-            try:
-                x, y, z = map(int, coord_str.split('_'))
-                return (z, x, y)
-            except:
-                return (9999, 9999, 9999)
-
-        all_coords = sorted(set(df1['Coord']).union(df2['Coord']), key=extract_coord_key)
-        coord_to_entries1 = {e['Coord']: e for e in filtered1}
-        coord_to_entries2 = {e['Coord']: e for e in filtered2}
+        # Align phantom and subject voxels with one outer merge on the coordinate
+        # (the last entry wins for repeated coordinates), already in z, x, y order
+        key_cols = ['Coord', 'x', 'y', 'z']
+        value_cols = [col for col in headers if col != 'Coord']
+        merged = pd.merge(
+            df1[key_cols + value_cols].drop_duplicates('Coord', keep='last'),
+            df2.reindex(columns=key_cols + value_cols, fill_value='').drop_duplicates('Coord', keep='last'),
+            on=key_cols, how='outer', suffixes=('_p', '_s'), indicator=True, sort=False,
+        ).sort_values(['z', 'x', 'y'], kind='stable')
+        cols_p = [col if col == 'Coord' else f"{col}_p" for col in headers]
+        cols_s = [col if col == 'Coord' else f"{col}_s" for col in headers]
+        n_cols = len(headers)
+
+        a_col = COL_LETTERS[area_idx]
+        l_col = COL_LETTERS[ld_idx]
+        h_col = COL_LETTERS[h_idx]
+        f_col = COL_LETTERS[f_idx]
+        i0ps_col = COL_LETTERS[f_idx + 1]
+        # Loop-invariant formula pieces; per row only the row number is concatenated in
+        height_p = "=" + a_col
+        fwhm_p = "=" + l_col
+        i0ps_p = "=" + h_col
+        i0_p = "=" + i0ps_col
+        i0_tail_p = "*(1-EXP(-$B$1/$B$2))"
+        i0_tail_s = "*(1-EXP(-$D$1/$D$2))"
+
+        # Rows are built as lists and appended in one call each instead of writing cell by cell
+        offset = 18
+        row_width = offset + len(header_cols)
 
         ws_all = wb.create_sheet(title="all")
-        ws_all.cell(row=1, column=1, value="TRp")
-        ws_all.cell(row=2, column=1, value="T1p")
-        ws_all.cell(row=3, column=1, value="TEp")
-        ws_all.cell(row=1, column=3, value="TRs")
-        ws_all.cell(row=2, column=3, value="T1s")
-        ws_all.cell(row=3, column=3, value="TEs")
-
-        for c, header in enumerate(header_cols, start=1):
-            ws_all.cell(row=4, column=c, value=f"{header}_p")
-        for c, header in enumerate(header_cols, start=1):
-            ws_all.cell(row=4, column=c + 18, value=f"{header}_s")
-
-        row_pointer = 5
-        for coord in all_coords:
-            r1 = coord_to_entries1.get(coord, None)
-            r2 = coord_to_entries2.get(coord, None)
-
-            if r1:
-                for c, col in enumerate(headers, start=1):
-                    ws_all.cell(row=row_pointer, column=c, value=r1.get(col, ''))
-                a_col = col_letter(area_idx)
-                l_col = col_letter(ld_idx)
-                h_col = col_letter(h_idx)
-                f_col = col_letter(f_idx)
-                ws_all.cell(row=row_pointer, column=h_idx + 1, value=f"={a_col}{row_pointer}/{l_col}{row_pointer}")
-                ws_all.cell(row=row_pointer, column=f_idx + 1, value=f"={l_col}{row_pointer}/PI()")
-                ws_all.cell(row=row_pointer, column=f_idx + 2, value=f"={h_col}{row_pointer}*EXP($B$3/{f_col}{row_pointer})")
-                i0_col = f_idx + 3
-                left_col_letter = get_column_letter(i0_col - 1)
-                ws_all.cell(row=row_pointer, column=i0_col,
-                            value=f"={left_col_letter}{row_pointer}*(1-EXP(-$B$1/$B$2))")
-
-            if r2:
-                offset = 18
-                for c, col in enumerate(headers, start=1):
-                    ws_all.cell(row=row_pointer, column=c + offset, value=r2.get(col, ''))
-                ws_all.cell(row=row_pointer, column=h_idx + 1 + offset, value=f"=V{row_pointer}/Y{row_pointer}")
-                ws_all.cell(row=row_pointer, column=f_idx + 1 + offset, value=f"=Y{row_pointer}/PI()")
-                ws_all.cell(row=row_pointer, column=f_idx + 2 + offset, value=f"=AE{row_pointer}*EXP($D$3/AF{row_pointer})")
-                ws_all.cell(row=row_pointer, column=f_idx + 3 + offset,
-                            value=f"=AG{row_pointer}*(1-EXP(-$D$1/$D$2))")
-
-            row_pointer += 1
+        ws_all.append(["TRp", None, "TRs", None, "Pc [mM]"])
+        ws_all.append(["T1p", None, "T1s"])
+        ws_all.append(["TEp", None, "TEs"])
+
+        header_row = [None] * row_width
+        header_row[:len(header_cols)] = [f"{header}_p" for header in header_cols]
+        header_row[offset:] = [f"{header}_s" for header in header_cols]
+        header_row.insert(c_idx, "c [mM]")
+        ws_all.append(header_row)
+
+        for r, (side, *values) in enumerate(
+                merged[['_merge'] + cols_p + cols_s].itertuples(index=False, name=None), start=5):
+            row = [None] * row_width
+
+            rs = str(r)
+            if side != 'right_only':
+                row[:n_cols] = values[:n_cols]
+                row[h_idx] = height_p + rs + "/" + l_col + rs
+                row[f_idx] = fwhm_p + rs + "/PI()"
+                row[f_idx + 1] = i0ps_p + rs + "*EXP($B$3/" + f_col + rs + ")"
+                row[f_idx + 2] = i0_p + rs + i0_tail_p
+
+            if side != 'left_only':
+                row[offset:offset + n_cols] = values[n_cols:]
+                row[h_idx + offset] = "=V" + rs + "/Y" + rs
+                row[f_idx + offset] = "=Y" + rs + "/PI()"
+                row[f_idx + 1 + offset] = "=AE" + rs + "*EXP($D$3/AF" + rs + ")"
+                row[f_idx + 2 + offset] = "=AG" + rs + i0_tail_s
+
+            # Hard-coded letters (subject block and c [mM]) refer to the layout after this insert
+            row.insert(c_idx, "=IF(AND(O" + rs + "<>0, AH" + rs + "<>0), (AH" + rs + "/O" + rs + ')*$F$1, "")')
+            ws_all.append(row)
 
 
         def write_z_sheet(wb, sheet_name, df_z, is_primary):
             ws = wb.create_sheet(title=sheet_name)
 
-            # Copy parameter headers from 'all' sheet
-            ws['A1'] = "TRp"
-            ws['A2'] = "T1p"
-            ws['A3'] = "TEp"
-            ws['C1'] = "TRs"
-            ws['C2'] = "T1s"
-            ws['C3'] = "TEs"
-
-            # Link values from 'all' sheet
-            ws['B1'] = "=all!B1"
-            ws['B2'] = "=all!B2"
-            ws['B3'] = "=all!B3"
-            ws['D1'] = "=all!D1"
-            ws['D2'] = "=all!D2"
-            ws['D3'] = "=all!D3"
-            ws['F1'] = "=all!F1"
-
-            for c, header in enumerate(header_cols, start=1):
-                ws.cell(row=4, column=c, value=header)
+            # Parameter headers linked to the values on the 'all' sheet
+            ws.append(["TRp", "=all!B1", "TRs", "=all!D1", "Pc [mM]", "='all'!F1"])
+            ws.append(["T1p", "=all!B2", "T1s", "=all!D2"])
+            ws.append(["TEp", "=all!B3", "TEs", "=all!D3"])
+            ws.append(header_cols[:c_idx] + ["c [mM]"] + header_cols[c_idx:])
 
             for r, entry in enumerate(df_z.itertuples(index=False), start=5):
-                for c, col in enumerate(headers, start=1):
-                    ws.cell(row=r, column=c, value=getattr(entry, col, ''))
-
-                a_col = col_letter(area_idx)
-                l_col = col_letter(ld_idx)
-                h_col = col_letter(h_idx)
-                f_col = col_letter(f_idx)
-
-                ws.cell(row=r, column=h_idx + 1, value=f"={a_col}{r}/{l_col}{r}")
-                ws.cell(row=r, column=f_idx + 1, value=f"={l_col}{r}/PI()")
-                ws.cell(row=r, column=f_idx + 2, value=f"={h_col}{r}*EXP($B$3/{f_col}{r})")
-
-                i0_col = f_idx + 3
-                ws.cell(row=r, column=i0_col, value=f"=N{r}*(1-EXP(-$B$1/$B$2))")
-
-
-        for z_val in sorted(df1['z'].unique()):
-            df_z = df1[df1['z'] == z_val]
+                row = [getattr(entry, col, '') for col in headers]
+                row += [None] * (len(header_cols) - len(row))
+                rs = str(r)
+                row[h_idx] = height_p + rs + "/" + l_col + rs
+                row[f_idx] = fwhm_p + rs + "/PI()"
+                row[f_idx + 1] = i0ps_p + rs + "*EXP($B$3/" + f_col + rs + ")"
+                row[f_idx + 2] = "=N" + rs + i0_tail_p
+                row.insert(c_idx, None)
+                ws.append(row)
+
+
+        # groupby sorts once and hands out each z-slice, instead of one boolean scan per z
+        for z_val, df_z in df1.groupby('z', sort=True):
             write_z_sheet(wb, f"z{z_val}p", df_z, is_primary=True)
 
-        for z_val in sorted(df2['z'].unique()):
-            df_z = df2[df2['z'] == z_val]
+        for z_val, df_z in df2.groupby('z', sort=True):
             write_z_sheet(wb, f"z{z_val}s", df_z, is_primary=False)
 
-        for ws in wb.worksheets:
-            ws.cell(row=1, column=5, value="Pc [mM]")
-            if ws.title != "all":
-                ws.cell(row=1, column=6, value="='all'!F1")
-
-        for ws in wb.worksheets:
-            ws.insert_cols(i0_idx + 2)
-            ws.cell(row=4, column=i0_idx + 2, value="c [mM]")
-            last_row = ws.max_row
-            if ws.title == "all":
-                for r in range(5, last_row + 1):
-                    formula = f'=IF(AND(O{r}<>0, AH{r}<>0), (AH{r}/O{r})*$F$1, "")'
-                    ws.cell(row=r, column=i0_idx + 2, value=formula)
-            else:
-                for r in range(5, last_row + 1):
-                    ws.cell(row=r, column=i0_idx + 2, value="")
-
-
-
         wb.save(excel_path)
         print(f"\nSaved Excel file to {excel_path}")
     else:
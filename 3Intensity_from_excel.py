@@ -10,20 +10,23 @@ Workflow:
 1. Prompts the user to select an Excel file (`.xlsx` or `.xls`).
    - Expects an "all" worksheet with headers starting on row 4 (index 3).
 2. Reads voxel coordinates from the `Coord_p` column (formatted as `x_y_z`) and extracts x, y, z.
-3. Uses the `c [mM]` column as intensity (renamed internally to `intensity`).
+3. Uses the `c [mM]` column as intensity (non-numeric cells become NaN).
 4. Asks the user to specify minimum (`vmin`) and maximum (`vmax`) intensity thresholds.
    - Values outside this range are masked and displayed as white.
 5. Iterates through all unique z-slices and creates a 2D intensity map (x vs. y):
    - Rows = y-coordinates, Columns = x-coordinates
    - Color scale = viridis (with masked values shown in white)
    - One heatmap per z-slice
-6. Displays each heatmap with axes labeled (x, y) and a colorbar labeled "Intensity (mM)".
+6. Displays the heatmaps one after another in a single window with axes labeled (x, y)
+   and a colorbar labeled "Intensity (mM)"; a key press or click shows the next slice.
 
 Key Features:
 - Consistent x,y grid across all z-slices for alignment.
 - Flexible intensity thresholding for visualization control.
+- Extracted voxel data is cached in `<excel file>.cache.npz`, so re-runs on an
+  unchanged workbook skip reading the Excel file.
 - Missing or invalid values are shown as white.
-- Heatmaps generated using `seaborn.heatmap`.
+- Heatmaps generated using `plt.imshow` (one image per slice).
 
 Dependencies:
 - Python standard library (`tkinter`)
@@ -31,25 +34,34 @@ Dependencies:
   • pandas  
   • numpy  
   • matplotlib  
-  • seaborn  
+  • openpyxl  
+  • optional: python-calamine or fastexcel (much faster reading of large workbooks)
 
 Usage:
 - Run the script in Python.
 - Select an Excel file containing an "all" sheet with voxel data.
 - Enter min/max intensity thresholds when prompted.
-- Inspect heatmaps for each z-slice.
+- Inspect heatmaps for each z-slice (key press or click for the next one, close the window to stop).
 
 """
 
 
+import os
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 import pandas as pd
 import matplotlib.pyplot as plt
-import seaborn as sns
 import numpy as np
 from matplotlib.colors import ListedColormap
+from openpyxl import load_workbook
 import tkinter as tk
 from tkinter import filedialog
 
+# pandas only knows the calamine engine from 2.2 on, and it needs python-calamine
+CALAMINE_AVAILABLE = (tuple(int(part) for part in pd.__version__.split('.')[:2]) >= (2, 2)
+                      and importlib.util.find_spec('python_calamine') is not None)
+
 # --- Select Excel file ---
 root = tk.Tk()
 root.withdraw()  # Hide main window
@@ -66,33 +78,98 @@ vmin = float(input("Enter minimum intensity value (e.g. 0): ") or 0)
 vmax = float(input("Enter maximum intensity value (e.g. 10): ") or 10)
 # -----------------------------
 
-# Read the "all" sheet using row 4 (index 3) as the header
-df = pd.read_excel(excel_file, sheet_name='all', header=3)
-
-# Clean column names
-df.columns = df.columns.str.strip()
+def read_all_frame(path):
+    """Read the 'all' sheet (header on row 4) with a Rust-based reader, or None if none is installed."""
+    if CALAMINE_AVAILABLE:
+        return pd.read_excel(path, sheet_name='all', header=3, engine='calamine')
+    try:
+        import fastexcel
+        # to_pandas() needs pyarrow, which fastexcel does not install by default
+        return fastexcel.read_excel(path).load_sheet('all', header_row=3).to_pandas()
+    except ImportError:
+        return None
+
+
+def read_all_sheet(path):
+    """Return the header (row 4) and the 'Coord_p' / 'c [mM]' values of the 'all' sheet."""
+    df = read_all_frame(path)
+    if df is None and path.lower().endswith('.xls'):
+        # openpyxl cannot open legacy .xls workbooks
+        df = pd.read_excel(path, sheet_name='all', header=3)
+    if df is not None:
+        df.columns = df.columns.astype(str).str.strip()
+        # Same rows as the streaming path: only rows with a coordinate
+        rows = df['Coord_p'].notna().to_numpy()
+        return df.columns.tolist(), df['Coord_p'].to_numpy()[rows], df['c [mM]'].to_numpy()[rows]
+
+    # Fallback: stream the sheet with openpyxl in read-only mode
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb['all'].iter_rows(min_row=4, values_only=True)
+        header = ['' if h is None else str(h).strip() for h in next(rows, ())]
+        ci = header.index('Coord_p')
+        ii = header.index('c [mM]')
+        coords = []
+        values = []
+        # Data starts on row 5; only the two used cells of each row are kept
+        for row in rows:
+            if row[ci] is None:
+                continue
+            coords.append(row[ci])
+            values.append(row[ii])
+    finally:
+        wb.close()
+    return header, coords, values
+
+
+def to_float(value):
+    """float(value), or NaN for empty or non-numeric cells."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+# Voxel arrays extracted from a workbook are cached next to it; the cache is used
+# as long as it is not older than the workbook
+cache_file = Path(excel_file + '.cache.npz')
+if cache_file.is_file() and cache_file.stat().st_mtime >= Path(excel_file).stat().st_mtime:
+    with np.load(cache_file) as cached:
+        header = cached['header'].tolist()
+        x, y, z, intensity = cached['x'], cached['y'], cached['z'], cached['i']
+    print(f"Loaded voxel data from cache: {cache_file}")
+else:
+    # Read the "all" sheet using row 4 as the header
+    header, coord_values, intensity_values = read_all_sheet(excel_file)
+
+    # Split 'Coord_p' into x, y, z in one NumPy pass (n x 3 int16 array; voxel indices are small)
+    coords = np.array(np.char.split(np.asarray(coord_values, dtype=str), '_').tolist(), dtype=np.int16)
+    x, y, z = coords[:, 0], coords[:, 1], coords[:, 2]
+
+    # Numeric intensity (float32, matching the plotting grid); empty/invalid cells become NaN
+    intensity = np.fromiter((to_float(v) for v in intensity_values), dtype=np.float32, count=len(intensity_values))
+
+    try:
+        np.savez_compressed(cache_file, header=np.array(header), x=x, y=y, z=z, i=intensity)
+    except OSError as e:
+        print(f"Could not write cache file {cache_file}: {e}")
 
 # Check loaded columns
-print("Loaded columns:", df.columns.tolist())
-
-# Split 'Coord_p' into x, y, z
-coords = df['Coord_p'].astype(str).str.split('_', expand=True)
-df['x'] = coords[0].astype(int)
-df['y'] = coords[1].astype(int)
-df['z'] = coords[2].astype(int)
-
-# Rename intensity column
-df.rename(columns={'c [mM]': 'intensity'}, inplace=True)
-
-# Ensure 'intensity' is numeric
-df['intensity'] = pd.to_numeric(df['intensity'], errors='coerce')
+print("Loaded columns:", header)
 
 # Get unique z slices
-z_slices = sorted(df['z'].unique())
+z_slices = np.unique(z)
 
 # For consistent axis coverage across slices, compute full x,y ranges now
-xs = np.arange(df['x'].min(), df['x'].max() + 1)
-ys = np.arange(df['y'].min(), df['y'].max() + 1)
+xs = np.arange(x.min(), x.max() + 1)
+ys = np.arange(y.min(), y.max() + 1)
+
+# Scatter all voxels into one dense (z, y, x) grid in a single write; missing voxels stay NaN
+zi = np.searchsorted(z_slices, z)
+yi = y - ys[0]
+xi = x - xs[0]
+grid = np.full((len(z_slices), len(ys), len(xs)), np.nan, dtype=np.float32)
+grid[zi, yi, xi] = intensity
 
 # Define colormap with white for masked/NaN values
 cmap = plt.get_cmap('viridis')
@@ -101,38 +178,59 @@ new_cmap = ListedColormap(new_colors)
 # Use set_bad so NaN/masked entries render white
 new_cmap.set_bad((1.0, 1.0, 1.0, 1.0))
 
-# Plot each z slice as heatmap
-for z in z_slices:
-    slice_df = df[df['z'] == z]
-
-    # Pivot to 2D grid (rows = y, cols = x)
-    intensity_grid = slice_df.pivot(index='y', columns='x', values='intensity')
-
-    # Ensure full grid coverage and ascending order so row 0 maps to the top row visually (no invert)
-    intensity_grid = intensity_grid.reindex(index=ys, columns=xs).sort_index(axis=0).sort_index(axis=1)
-
-    # Replace empty strings with NaN and ensure float dtype
-    intensity_grid = intensity_grid.replace('', np.nan).astype(float)
-
-    # Mask values outside chosen vmin/vmax and also the NaNs
-    out_of_range_mask = (intensity_grid < vmin) | (intensity_grid > vmax) | intensity_grid.isna()
-    # Make a copy where out-of-range are set to NaN so they render as white (set_bad)
-    plot_data = intensity_grid.mask(out_of_range_mask)
-
-    plt.figure(figsize=(8, 6))
-    sns.heatmap(
-        plot_data,
-        cmap=new_cmap,
-        cbar_kws={'label': 'Intensity (mM)'},
-        linewidths=0.5,
-        vmin=vmin,
-        vmax=vmax,
-        mask=plot_data.isna(),  # ensure NaNs are masked (and show as white)
-        square=False
-    )
-    plt.title(f'Intensity Map at z = {z} (values outside [{vmin}, {vmax}] shown white)')
-    plt.xlabel('x')
-    plt.ylabel('y')
-    # NOTE: removed plt.gca().invert_yaxis() so y=0 displays at the top (row 0 → top-left)
-    plt.tight_layout()
-    plt.show()
+# One figure, image and colorbar for all slices; each slice only swaps the image data
+fig, ax = plt.subplots(figsize=(8, 6))
+# extent maps pixels to voxel coordinates with y=ys[0] at the top
+im = ax.imshow(
+    np.full((len(ys), len(xs)), np.nan, dtype=np.float32),
+    cmap=new_cmap,
+    vmin=vmin,
+    vmax=vmax,
+    origin='upper',
+    interpolation='nearest',
+    aspect='auto',
+    extent=(xs[0] - 0.5, xs[-1] + 0.5, ys[-1] + 0.5, ys[0] - 0.5)
+)
+fig.colorbar(im, ax=ax, label='Intensity (mM)')
+ax.set_xlabel('x')
+ax.set_ylabel('y')
+# NOTE: removed plt.gca().invert_yaxis() so y=0 displays at the top (row 0 → top-left)
+ax.set_title(f'Intensity Map at z = {z_slices[0]} (values outside [{vmin}, {vmax}] shown white)')
+fig.tight_layout()
+plt.show(block=False)
+
+print("Press a key or click in the figure for the next slice; close it to stop.")
+
+# waitforbuttonpress only returns on a key/click, and with the hidden Tk root still
+# alive closing the window would leave it waiting; stop its event loop on close too
+fig.canvas.mpl_connect('close_event', lambda event: fig.canvas.stop_event_loop())
+
+# Filtered slices are written into one preallocated grid (NaN = shown white)
+plot_grid = np.full_like(grid, np.nan)
+
+
+def filter_slice(k):
+    """Copy the values of slice k inside [vmin, vmax] into plot_grid[k] and return it."""
+    # Slice k of the grid (rows = y, cols = x, ascending so row 0 maps to the top row)
+    intensity_grid = grid[k]
+    in_range = np.greater_equal(intensity_grid, vmin)
+    np.logical_and(in_range, np.less_equal(intensity_grid, vmax), out=in_range)
+    np.copyto(plot_grid[k], intensity_grid, where=in_range)
+    return plot_grid[k]
+
+
+# Slices are filtered on worker threads (NumPy releases the GIL) while the main
+# thread displays them in order
+with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+    # Plot each z slice as heatmap
+    for z_val, plot_data in zip(z_slices, executor.map(filter_slice, range(len(z_slices)))):
+        im.set_data(plot_data)
+        ax.set_title(f'Intensity Map at z = {z_val} (values outside [{vmin}, {vmax}] shown white)')
+        fig.canvas.draw_idle()
+
+        # Wait for the user; a closed window ends the slideshow
+        fig.waitforbuttonpress()
+        if not plt.fignum_exists(fig.number):
+            break
+
+plt.close(fig)
@@ -58,8 +58,8 @@ def show_image_with_brightness_slider(image, title):
     fig, ax = plt.subplots(figsize=(6, 6))
     plt.subplots_adjust(bottom=0.25)  # Make space for slider
 
-    # Initial display
-    img_display = ax.imshow(img_norm, cmap='gray')
+    # Initial display; fixed [0,1] limits so slider updates need no renormalization
+    img_display = ax.imshow(img_norm, cmap='gray', vmin=0, vmax=1)
     ax.set_title(title)
     ax.axis('off')
 
@@ -67,32 +67,63 @@ def show_image_with_brightness_slider(image, title):
     ax_brightness = plt.axes([0.25, 0.1, 0.5, 0.03])
     slider = Slider(ax_brightness, 'Brightness', 0.1, 8.0, valinit=1.0)
 
+    # Scratch buffer reused by every slider update instead of allocating new images
+    scratch = np.empty_like(img_norm)
+
+    # Blitting: the image and the slider are animated, so full redraws leave them out of
+    # the cached background and slider updates only repaint these two artists
+    img_display.set_animated(True)
+    ax_brightness.set_animated(True)
+    slider.drawon = False
+    background = None
+
+    def draw_animated():
+        ax.draw_artist(img_display)
+        fig.draw_artist(ax_brightness)
+
+    # Refresh the cached background after every full draw (first show, resize, ...)
+    def on_draw(event):
+        nonlocal background
+        background = fig.canvas.copy_from_bbox(fig.bbox)
+        draw_animated()
+
     # Update function for slider
     def update(val):
         brightness = slider.val
-        new_img = np.clip(img_norm * brightness, 0, 1)
-        img_display.set_data(new_img)
-        fig.canvas.draw_idle()
-
+        np.multiply(img_norm, brightness, out=scratch)
+        np.clip(scratch, 0, 1, out=scratch)
+        img_display.set_data(scratch)
+        if background is None:
+            fig.canvas.draw_idle()
+            return
+        fig.canvas.restore_region(background)
+        draw_animated()
+        fig.canvas.blit(fig.bbox)
+
+    fig.canvas.mpl_connect('draw_event', on_draw)
     slider.on_changed(update)
     plt.show()
 
-# Loop through all files in the folder
-for filename in os.listdir(dcm_folder):
-    if filename.endswith(".dcm"):
-        dcm_path = os.path.join(dcm_folder, filename)
+# Loop through all DICOM files in the folder (scandir filters on the name before any stat)
+with os.scandir(dcm_folder) as entries:
+    dcm_entries = [entry for entry in entries if entry.name.endswith(".dcm") and entry.is_file()]
+
+for entry in dcm_entries:
+    filename = entry.name
+    dcm_path = entry.path
 
-        # Load the DICOM file
-        ds = pydicom.dcmread(dcm_path)
+    # Load the DICOM file; large elements other than the pixel data are only read on access
+    ds = pydicom.dcmread(dcm_path, defer_size="1 KB")
 
-        # Print basic metadata
-        print(f"File: {filename}")
-        print("  Patient Name:", ds.get("PatientName", "Unknown"))
-        print("  Modality:", ds.get("Modality", "Unknown"))
-        print("  Study Date:", ds.get("StudyDate", "Unknown"))
+    # Print basic metadata
+    print(f"File: {filename}")
+    print("  Patient Name:", ds.get("PatientName", "Unknown"))
+    print("  Modality:", ds.get("Modality", "Unknown"))
+    print("  Study Date:", ds.get("StudyDate", "Unknown"))
 
-        # Get image data
-        image = ds.pixel_array
+    # Get image data, then release the dataset so only one slice is held at a time
+    image = ds.pixel_array
+    del ds
 
-        # Show image with brightness slider
-        show_image_with_brightness_slider(image, f'MR Image: {filename}')
+    # Show image with brightness slider
+    show_image_with_brightness_slider(image, f'MR Image: {filename}')
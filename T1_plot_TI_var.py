@@ -16,19 +16,25 @@ This script:
  - Optionally saves results and plots to Excel
 """
 
+import re
+from io import BytesIO
 import numpy as np
 import matplotlib.pyplot as plt
 from scipy.optimize import curve_fit
 from tkinter import Tk, filedialog, messagebox
-import pandas as pd
-from openpyxl import load_workbook
-from openpyxl.drawing.image import Image
+import xlsxwriter
+
+# The PNGs only end up embedded in the workbook, so fast zlib compression beats small files
+PNG_OPTIONS = {"compress_level": 1}
 
 # ============================
 # 1) Load data interactively
 # ============================
+# One hidden Tk root serves every file dialog and message box below
+root = Tk()
+root.withdraw()
+
 def load_txt_file(prompt):
-    Tk().withdraw()
     path = filedialog.askopenfilename(
         title=prompt,
         filetypes=[("Text files", "*.txt"), ("All files", "*.*")]
@@ -44,53 +50,37 @@ ti_file = load_txt_file("Select TXT file with inversion times (first line = head
 # ============================
 # 2) Parse amplitude + phase file
 # ============================
-def extract_signed_amplitudes_jmrui(path):
-    amps, phases = [], []
-    inside_amp = inside_phase = False
+# Whitespace-separated tokens that float() accepts; anything else in a section is skipped
+FLOAT_TOKEN_RE = re.compile(r'(?<!\S)[-+]?(?:(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?|(?i:nan|inf(?:inity)?))(?!\S)')
 
+
+def section_values(text, name):
+    """Numbers of every '<name>' section, up to its 'Standard deviation of <name>' line."""
+    section_re = re.compile(
+        rf'^[ \t]*{name}[^\n]*\n(.*?)(?:^[ \t]*Standard deviation of {name}|\Z)',
+        re.M | re.S
+    )
+    tokens = [t for m in section_re.finditer(text) for t in FLOAT_TOKEN_RE.findall(m.group(1))]
+    return np.array(tokens, dtype=float)
+
+
+def extract_signed_amplitudes_jmrui(path):
     with open(path, "r") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-
-            if line.startswith("Amplitudes"):
-                inside_amp = True
-                continue
-            if inside_amp:
-                if line.startswith("Standard deviation of Amplitudes"):
-                    inside_amp = False
-                    continue
-                for v in line.split():
-                    try:
-                        amps.append(float(v))
-                    except ValueError:
-                        pass
-
-            if line.startswith("Phases"):
-                inside_phase = True
-                continue
-            if inside_phase:
-                if line.startswith("Standard deviation of Phases"):
-                    inside_phase = False
-                    continue
-                for v in line.split():
-                    try:
-                        phases.append(float(v))
-                    except ValueError:
-                        pass
-
-    if not amps:
+        text = f.read()
+    amps = section_values(text, "Amplitudes")
+    phases = section_values(text, "Phases")
+
+    if not amps.size:
         raise ValueError("❌ No amplitudes found.")
 
-    if not phases:
+    if not phases.size:
         print("⚠️ No phase data found — using amplitudes as-is.")
-        return np.array(amps, float)
+        return amps
 
     n = min(len(amps), len(phases))
-    signed = [a if p >= 0 else -a for a, p in zip(amps[:n], phases[:n])]
+    signed = np.where(phases[:n] >= 0, amps[:n], -amps[:n])
     print(f"✅ Extracted {n} signed amplitudes.")
-    return np.array(signed, float)
+    return signed
 
 
 Amplitudes = extract_signed_amplitudes_jmrui(amp_file)
@@ -123,12 +113,32 @@ if len(TI) != len(Amplitudes):
 # ============================
 # 5) Models
 # ============================
+# curve_fit evaluates these many times on short arrays, so each model allocates
+# one array and updates it in place: M0 * (1 - 2a*e) == M0 + (-2*a*M0) * e
 def ir_model_signed(TI, M0, T1, alpha):
-    return M0 * (1 - 2 * alpha * np.exp(-TI / T1))
+    s = np.multiply(TI, -1.0 / T1)
+    np.exp(s, out=s)
+    s *= -2.0 * alpha * M0
+    s += M0
+    return s
 
 
 def ir_model_alpha1(TI, M0, T1):
-    return M0 * (1 - 2 * np.exp(-TI / T1))
+    return ir_model_signed(TI, M0, T1, 1.0)
+
+
+# Analytic Jacobians (one column per parameter) so curve_fit skips finite differences
+def jac_ir_signed(TI, M0, T1, alpha):
+    e = np.exp(np.multiply(TI, -1.0 / T1))
+    return np.column_stack((
+        1.0 - 2.0 * alpha * e,
+        (-2.0 * alpha * M0 / (T1 * T1)) * TI * e,
+        -2.0 * M0 * e,
+    ))
+
+
+def jac_ir_alpha1(TI, M0, T1):
+    return jac_ir_signed(TI, M0, T1, 1.0)[:, :2]
 
 # ============================
 # 6) Fit
@@ -136,37 +146,32 @@ def ir_model_alpha1(TI, M0, T1):
 M0_guess = np.max(np.abs(Amplitudes))
 T1_guess = np.median(TI)
 
+# α = 1 fit: needed for the comparison plots and reused as the fallback below
+popt_fixed, pcov_fixed = curve_fit(
+    ir_model_alpha1, TI, Amplitudes,
+    p0=[M0_guess, T1_guess], jac=jac_ir_alpha1,
+    bounds=([0, 1e-6], [M0_guess * 10, TI.max() * 100]),
+    maxfev=20000
+)
+M0_fixed, T1_fixed = popt_fixed
+M0_err_fixed, T1_err_fixed = np.sqrt(np.diag(pcov_fixed))
+
 try:
     popt, pcov = curve_fit(
         ir_model_signed, TI, Amplitudes,
-        p0=[M0_guess, T1_guess, 1.0],
+        p0=[M0_guess, T1_guess, 1.0], jac=jac_ir_signed,
         bounds=([0, 1e-6, 0], [M0_guess * 10, TI.max() * 100, 1.5]),
         maxfev=20000
     )
     M0_fit, T1_fit, alpha_fit = popt
     M0_err, T1_err, alpha_err = np.sqrt(np.diag(pcov))
 except Exception:
+    # Same model, data and start values as the α = 1 fit, so take its results
     alpha_fit = 1.0
-    popt, pcov = curve_fit(
-        ir_model_alpha1, TI, Amplitudes,
-        p0=[M0_guess, T1_guess],
-        bounds=([0, 1e-6], [M0_guess * 10, TI.max() * 100]),
-        maxfev=20000
-    )
-    M0_fit, T1_fit = popt
-    M0_err, T1_err = np.sqrt(np.diag(pcov))
+    M0_fit, T1_fit = M0_fixed, T1_fixed
+    M0_err, T1_err = M0_err_fixed, T1_err_fixed
     alpha_err = np.nan
 
-# α = 1 comparison fit
-popt_fixed, pcov_fixed = curve_fit(
-    ir_model_alpha1, TI, Amplitudes,
-    p0=[M0_guess, T1_guess],
-    bounds=([0, 1e-6], [M0_guess * 10, TI.max() * 100]),
-    maxfev=20000
-)
-M0_fixed, T1_fixed = popt_fixed
-M0_err_fixed, T1_err_fixed = np.sqrt(np.diag(pcov_fixed))
-
 # ============================
 # 7) Plot & store three figures
 # ============================
@@ -177,7 +182,7 @@ fit_fixed = ir_model_alpha1(TI_fit, M0_fixed, T1_fixed)
 figures = {}
 
 # --- α-free
-fig, ax = plt.subplots(figsize=(7, 5))
+fig, ax = plt.subplots(figsize=(7, 5), layout="constrained")
 ax.scatter(TI, Amplitudes, label="Data")
 ax.plot(TI_fit, fit_alpha, label=f"α-free (α={alpha_fit:.2f})")
 ax.set_title("T1 Inversion Recovery – α-free")
@@ -185,12 +190,11 @@ ax.set_xlabel("TI (ms)")
 ax.set_ylabel("Signal (a.u.)")
 ax.text(0.05, 0.9, f"T1 = {T1_fit:.1f} ± {T1_err:.1f} ms", transform=ax.transAxes)
 ax.legend(); ax.grid(True, linestyle="--", alpha=0.6)
-fig.tight_layout()
 plt.show()
 figures["alpha_free"] = fig
 
 # --- α = 1
-fig, ax = plt.subplots(figsize=(7, 5))
+fig, ax = plt.subplots(figsize=(7, 5), layout="constrained")
 ax.scatter(TI, Amplitudes, label="Data")
 ax.plot(TI_fit, fit_fixed, "--", label="α = 1")
 ax.set_title("T1 Inversion Recovery – α = 1")
@@ -198,12 +202,11 @@ ax.set_xlabel("TI (ms)")
 ax.set_ylabel("Signal (a.u.)")
 ax.text(0.05, 0.9, f"T1 = {T1_fixed:.1f} ± {T1_err_fixed:.1f} ms", transform=ax.transAxes)
 ax.legend(); ax.grid(True, linestyle="--", alpha=0.6)
-fig.tight_layout()
 plt.show()
 figures["alpha_1"] = fig
 
 # --- Combined
-fig, ax = plt.subplots(figsize=(7, 5))
+fig, ax = plt.subplots(figsize=(7, 5), layout="constrained")
 ax.scatter(TI, Amplitudes, label="Data")
 ax.plot(TI_fit, fit_alpha, label=f"α-free (α={alpha_fit:.2f})")
 ax.plot(TI_fit, fit_fixed, "--", label="α = 1")
@@ -217,14 +220,23 @@ ax.text(
     transform=ax.transAxes
 )
 ax.legend(); ax.grid(True, linestyle="--", alpha=0.6)
-fig.tight_layout()
 plt.show()
 figures["combined"] = fig
 
 # ============================
 # 8) Optional Excel export
 # ============================
-Tk().withdraw()
+def excel_value(value):
+    """Cell value to write: NaN is left blank and infinities are written as text."""
+    if isinstance(value, float) and not np.isfinite(value):
+        return None if np.isnan(value) else str(value)
+    return value
+
+def write_sheet(ws, rows):
+    """Write rows (header first) to ws."""
+    for r, row in enumerate(rows):
+        ws.write_row(r, 0, tuple(excel_value(v) for v in row))
+
 if messagebox.askyesno("Save Results?", "Save data, fit results, and plots into Excel?"):
 
     save_path = filedialog.asksaveasfilename(
@@ -233,33 +245,36 @@ if messagebox.askyesno("Save Results?", "Save data, fit results, and plots into
     )
 
     if save_path:
-        df_data = pd.DataFrame({"TI_ms": TI, "Amplitude": Amplitudes})
-        df_fit = pd.DataFrame({
-            "Parameter": ["M0", "T1", "alpha"],
-            "Value": [M0_fit, T1_fit, alpha_fit],
-            "Error": [M0_err, T1_err, alpha_err]
-        })
-        df_fit_fixed = pd.DataFrame({
-            "Parameter": ["M0_fixed", "T1_fixed"],
-            "Value": [M0_fixed, T1_fixed],
-            "Error": [M0_err_fixed, T1_err_fixed]
-        })
-
-        with pd.ExcelWriter(save_path, engine="openpyxl") as writer:
-            df_data.to_excel(writer, sheet_name="Data", index=False)
-            df_fit.to_excel(writer, sheet_name="Fit_alpha_free", index=False)
-            df_fit_fixed.to_excel(writer, sheet_name="Fit_alpha_1", index=False)
-
-        wb = load_workbook(save_path)
-        ws = wb.create_sheet("Plots")
-
-        row = 1
-        for name, fig in figures.items():
-            img_path = save_path.replace(".xlsx", f"_{name}.png")
-            fig.savefig(img_path, dpi=150)
-            ws.add_image(Image(img_path), f"A{row}")
-            row += 25
-            plt.close(fig)
-
-        wb.save(save_path)
+        data_rows = [("TI_ms", "Amplitude"), *zip(TI.tolist(), Amplitudes.tolist())]
+        fit_rows = [
+            ("Parameter", "Value", "Error"),
+            ("M0", M0_fit, M0_err),
+            ("T1", T1_fit, T1_err),
+            ("alpha", alpha_fit, alpha_err),
+        ]
+        fit_fixed_rows = [
+            ("Parameter", "Value", "Error"),
+            ("M0_fixed", M0_fixed, M0_err_fixed),
+            ("T1_fixed", T1_fixed, T1_err_fixed),
+        ]
+
+        # Data, fit results and plots go into one workbook, which is written on close
+        with xlsxwriter.Workbook(save_path) as workbook:
+            write_sheet(workbook.add_worksheet("Data"), data_rows)
+            write_sheet(workbook.add_worksheet("Fit_alpha_free"), fit_rows)
+            write_sheet(workbook.add_worksheet("Fit_alpha_1"), fit_fixed_rows)
+
+            ws = workbook.add_worksheet("Plots")
+
+            # Render each figure to an in-memory PNG and embed the buffer directly
+            # (the file name only labels the image)
+            row = 1
+            for name, fig in figures.items():
+                buf = BytesIO()
+                fig.savefig(buf, format="png", dpi=150, pil_kwargs=PNG_OPTIONS)
+                plt.close(fig)
+                buf.seek(0)
+                ws.insert_image(f"A{row}", f"{name}.png", {"image_data": buf})
+                row += 25
+
         print(f"📁 Results and plots saved to {save_path}")
@@ -10,19 +10,26 @@ This script:
  - Saves individual plots and embeds both in Excel
 """
 
+import re
+from io import BytesIO
 import numpy as np
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 from scipy.optimize import curve_fit
 from tkinter import Tk, filedialog, messagebox
-import pandas as pd
-from openpyxl import load_workbook
-from openpyxl.drawing.image import Image
+import xlsxwriter
+
+# Fast zlib level for the saved plot PNGs (slightly larger files, much quicker encoding)
+PNG_OPTIONS = {"compress_level": 1}
 
 # ============================
 # 1) Load data
 # ============================
+# One hidden Tk root serves every file dialog and message box below
+root = Tk()
+root.withdraw()
+
 def load_txt_file(prompt="Select a TXT file"):
-    Tk().withdraw()
     file_path = filedialog.askopenfilename(
         title=prompt,
         filetypes=[("Text files", "*.txt"), ("All files", "*.*")]
@@ -34,24 +41,19 @@ def load_txt_file(prompt="Select a TXT file"):
 amp_file = load_txt_file("Select TXT file with amplitudes")
 te_file = load_txt_file("Select TXT file with echo times (TE)")
 
+# Whitespace-separated tokens that float() accepts; anything else in the section is skipped
+FLOAT_TOKEN_RE = re.compile(r'(?<!\S)[-+]?(?:(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?|(?i:nan|inf(?:inity)?))(?!\S)')
+AMPLITUDES_RE = re.compile(
+    r'^[ \t]*Amplitudes[^\n]*\n(.*?)(?:^[ \t]*Standard deviation of Amplitudes|\Z)',
+    re.M | re.S
+)
+
 def extract_amplitudes_jmrui(path):
-    amps = []
-    inside = False
     with open(path, "r") as f:
-        for line in f:
-            line = line.strip()
-            if line.startswith("Amplitudes"):
-                inside = True
-                continue
-            if inside:
-                if line.startswith("Standard deviation of Amplitudes"):
-                    break
-                for val in line.split():
-                    try:
-                        amps.append(float(val))
-                    except ValueError:
-                        pass
-    return np.array(amps, dtype=float)
+        text = f.read()
+    m = AMPLITUDES_RE.search(text)
+    tokens = FLOAT_TOKEN_RE.findall(m.group(1)) if m else []
+    return np.array(tokens, dtype=float)
 
 Amplitudes = extract_amplitudes_jmrui(amp_file)
 
@@ -72,11 +74,25 @@ if len(Amplitudes) != len(TE):
 # ============================
 # 2) Model definitions
 # ============================
+# exp() is positive, so |M0 * alpha * exp(.)| == |M0 * alpha| * exp(.); the decay is
+# computed in one array updated in place, as curve_fit calls these many times
 def mag_t2_alpha(TE, M0, T2, alpha):
-    return np.abs(M0 * alpha * np.exp(-TE / T2))
+    s = np.multiply(TE, -1.0 / T2)
+    np.exp(s, out=s)
+    s *= abs(M0 * alpha)
+    return s
 
 def mag_t2_alpha1(TE, M0, T2):
-    return np.abs(M0 * np.exp(-TE / T2))
+    return mag_t2_alpha(TE, M0, T2, 1.0)
+
+# Analytic Jacobian for the alpha=1 fit; the bounds keep M0 >= 0, where
+# |M0 * exp(.)| is just M0 * exp(.).
+# The alpha-free fit keeps curve_fit's numerical Jacobian: the model only depends on
+# M0 * alpha, so an exact Jacobian has proportional M0 and alpha columns and the
+# pseudo-inverse would hide that degeneracy behind small M0/alpha errors
+def jac_t2_alpha1(TE, M0, T2):
+    e = np.exp(np.multiply(TE, -1.0 / T2))
+    return np.column_stack((e, (M0 / (T2 * T2)) * TE * e))
 
 # ============================
 # 3) Fit with alpha free
@@ -109,7 +125,7 @@ except:
 # ============================
 p0_fixed = [M0_guess, T2_guess]
 bounds_fixed = ([0.0, 1e-6], [M0_guess * 10.0, TE.max() * 100.0])
-popt_fixed, pcov_fixed = curve_fit(mag_t2_alpha1, TE, Amplitudes,
+popt_fixed, pcov_fixed = curve_fit(mag_t2_alpha1, TE, Amplitudes, jac=jac_t2_alpha1,
                                    p0=p0_fixed, bounds=bounds_fixed, maxfev=20000)
 perr_fixed = np.sqrt(np.abs(np.diag(pcov_fixed)))
 M0_fixed, T2_fixed = popt_fixed
@@ -119,6 +135,9 @@ M0_err_fixed, T2_err_fixed = perr_fixed
 # 5) Goodness of fit
 # ============================
 TE_fit = np.linspace(0, TE.max() * 1.05, 400)
+# Fitted curves on the plotting grid, shared by all plots below
+fit_alpha = mag_t2_alpha(TE_fit, M0_alpha, T2_alpha, alpha_fit)
+fit_fixed = mag_t2_alpha1(TE_fit, M0_fixed, T2_fixed)
 pred_alpha = mag_t2_alpha(TE, M0_alpha, T2_alpha, alpha_fit)
 pred_fixed = mag_t2_alpha1(TE, M0_fixed, T2_fixed)
 
@@ -135,9 +154,9 @@ r2_fixed = calc_r2(Amplitudes, pred_fixed)
 # ============================
 plt.figure(figsize=(7, 5))
 plt.scatter(TE, Amplitudes, label="Measured data", color="blue")
-plt.plot(TE_fit, mag_t2_alpha(TE_fit, M0_alpha, T2_alpha, alpha_fit),
+plt.plot(TE_fit, fit_alpha,
          label=f"Fit (alpha free, alpha={alpha_fit:.2f})", color="red")
-plt.plot(TE_fit, mag_t2_alpha1(TE_fit, M0_fixed, T2_fixed),
+plt.plot(TE_fit, fit_fixed,
          label="Fit (alpha=1)", color="green", linestyle="--")
 plt.xlabel("Echo Time TE (ms)")
 plt.ylabel("Signal Intensity (a.u.)")
@@ -153,7 +172,71 @@ plt.show()
 # ============================
 # 7) Save individual plots
 # ============================
-Tk().withdraw()
+# The saved plots are drawn one after another on the same standalone Figure (no
+# pyplot state); the figure is cleared and given a fresh axes between them
+def draw_alpha_plot(ax):
+    ax.scatter(TE, Amplitudes, label="Data", color="blue")
+    ax.plot(TE_fit, fit_alpha, color="red")
+    ax.text(0.05, 0.9, f"T2 = {T2_alpha:.1f} ± {T2_err_alpha:.1f} ms", transform=ax.transAxes, color="red")
+    ax.set_title("T2 Fit (alpha free)")
+    ax.set_xlabel("TE (ms)")
+    ax.set_ylabel("Signal")
+
+def draw_fixed_plot(ax):
+    ax.scatter(TE, Amplitudes, label="Data", color="blue")
+    ax.plot(TE_fit, fit_fixed, color="green")
+    ax.text(0.05, 0.9, f"T2 = {T2_fixed:.1f} ± {T2_err_fixed:.1f} ms", transform=ax.transAxes,
+            color="green")
+    ax.set_title("T2 Fit (alpha=1)")
+    ax.set_xlabel("TE (ms)")
+    ax.set_ylabel("Signal")
+
+def draw_combined_plot(ax):
+    ax.scatter(TE, Amplitudes, label="Data", color="blue")
+    ax.plot(TE_fit, fit_alpha,
+            label=f"Fit alpha free (alpha={alpha_fit:.2f})", color="red")
+    ax.plot(TE_fit, fit_fixed,
+            label="Fit alpha=1", color="green", linestyle="--")
+    ax.text(0.05, 0.9, f"T2 alpha free = {T2_alpha:.1f} ± {T2_err_alpha:.1f} ms", transform=ax.transAxes,
+            color="red")
+    ax.text(0.05, 0.83, f"T2 alpha=1   = {T2_fixed:.1f} ± {T2_err_fixed:.1f} ms", transform=ax.transAxes,
+            color="green")
+    ax.set_xlabel("TE (ms)")
+    ax.set_ylabel("Signal Intensity")
+    ax.set_title("T2 Fit Comparison")
+    ax.legend()
+    ax.grid(True, linestyle="--", alpha=0.6)
+
+def save_plots(paths):
+    """Save the alpha-free, alpha=1 and combined plots to the three given paths.
+
+    Returns the in-memory PNG of each plot, so Excel can embed them without
+    reading the files back.
+    """
+    fig = Figure(figsize=(7, 5), layout="constrained")
+    buffers = []
+    for draw, path in zip((draw_alpha_plot, draw_fixed_plot, draw_combined_plot), paths):
+        fig.clear()
+        draw(fig.add_subplot())
+        buf = BytesIO()
+        fig.savefig(buf, format="png", dpi=150, pil_kwargs=PNG_OPTIONS)
+        with open(path, "wb") as f:
+            f.write(buf.getbuffer())
+        buf.seek(0)
+        buffers.append(buf)
+    return buffers
+
+def excel_value(value):
+    """Cell value to write: NaN is left blank and infinities are written as text."""
+    if isinstance(value, float) and not np.isfinite(value):
+        return None if np.isnan(value) else str(value)
+    return value
+
+def write_sheet(ws, rows):
+    """Write rows (header first) to ws."""
+    for r, row in enumerate(rows):
+        ws.write_row(r, 0, tuple(excel_value(v) for v in row))
+
 save_choice = messagebox.askyesno("Save Results?", "Do you want to save data, fit results, and plots?")
 
 if save_choice:
@@ -161,77 +244,34 @@ if save_choice:
                                              filetypes=[("Excel files", "*.xlsx"), ("All files", "*.*")])
     if save_path:
         # Save Data + FitResults
-        df_data = pd.DataFrame({"TE_ms": TE, "Amplitude": Amplitudes})
-        df_fit = pd.DataFrame({
-            "Parameter": ["M0_alpha", "T2_alpha", "alpha", "R2_alpha",
-                          "M0_fixed", "T2_fixed", "R2_fixed"],
-            "Value": [M0_alpha, T2_alpha, alpha_fit, r2_alpha,
-                      M0_fixed, T2_fixed, r2_fixed],
-            "Error": [M0_err_alpha, T2_err_alpha, alpha_err, "",
-                      M0_err_fixed, T2_err_fixed, ""]
-        })
-
-        with pd.ExcelWriter(save_path, engine="openpyxl") as writer:
-            df_data.to_excel(writer, sheet_name="Data", index=False)
-            df_fit.to_excel(writer, sheet_name="FitResults", index=False)
+        data_rows = [("TE_ms", "Amplitude"), *zip(TE.tolist(), Amplitudes.tolist())]
+        fit_rows = [
+            ("Parameter", "Value", "Error"),
+            ("M0_alpha", M0_alpha, M0_err_alpha),
+            ("T2_alpha", T2_alpha, T2_err_alpha),
+            ("alpha", alpha_fit, alpha_err),
+            ("R2_alpha", r2_alpha, ""),
+            ("M0_fixed", M0_fixed, M0_err_fixed),
+            ("T2_fixed", T2_fixed, T2_err_fixed),
+            ("R2_fixed", r2_fixed, ""),
+        ]
 
         # Save plots individually
         plot_alpha_file = save_path.replace(".xlsx", "_plot_alpha.png")
         plot_fixed_file = save_path.replace(".xlsx", "_plot_fixed.png")
         plot_combined_file = save_path.replace(".xlsx", "_plot_combined.png")
 
-        # Plot alpha free
-        plt.figure(figsize=(7, 5))
-        plt.scatter(TE, Amplitudes, label="Data", color="blue")
-        plt.plot(TE_fit, mag_t2_alpha(TE_fit, M0_alpha, T2_alpha, alpha_fit), color="red")
-        plt.text(0.05, 0.9, f"T2 = {T2_alpha:.1f} ± {T2_err_alpha:.1f} ms", transform=plt.gca().transAxes, color="red")
-        plt.title("T2 Fit (alpha free)")
-        plt.xlabel("TE (ms)")
-        plt.ylabel("Signal")
-        plt.tight_layout()
-        plt.savefig(plot_alpha_file, dpi=150)
-        plt.close()
-
-        # Plot alpha=1
-        plt.figure(figsize=(7, 5))
-        plt.scatter(TE, Amplitudes, label="Data", color="blue")
-        plt.plot(TE_fit, mag_t2_alpha1(TE_fit, M0_fixed, T2_fixed), color="green")
-        plt.text(0.05, 0.9, f"T2 = {T2_fixed:.1f} ± {T2_err_fixed:.1f} ms", transform=plt.gca().transAxes,
-                 color="green")
-        plt.title("T2 Fit (alpha=1)")
-        plt.xlabel("TE (ms)")
-        plt.ylabel("Signal")
-        plt.tight_layout()
-        plt.savefig(plot_fixed_file, dpi=150)
-        plt.close()
-
-        # Combined plot
-        plt.figure(figsize=(7, 5))
-        plt.scatter(TE, Amplitudes, label="Data", color="blue")
-        plt.plot(TE_fit, mag_t2_alpha(TE_fit, M0_alpha, T2_alpha, alpha_fit),
-                 label=f"Fit alpha free (alpha={alpha_fit:.2f})", color="red")
-        plt.plot(TE_fit, mag_t2_alpha1(TE_fit, M0_fixed, T2_fixed),
-                 label="Fit alpha=1", color="green", linestyle="--")
-        plt.text(0.05, 0.9, f"T2 alpha free = {T2_alpha:.1f} ± {T2_err_alpha:.1f} ms", transform=plt.gca().transAxes,
-                 color="red")
-        plt.text(0.05, 0.83, f"T2 alpha=1   = {T2_fixed:.1f} ± {T2_err_fixed:.1f} ms", transform=plt.gca().transAxes,
-                 color="green")
-        plt.xlabel("TE (ms)")
-        plt.ylabel("Signal Intensity")
-        plt.title("T2 Fit Comparison")
-        plt.legend()
-        plt.grid(True, linestyle="--", alpha=0.6)
-        plt.tight_layout()
-        plt.savefig(plot_combined_file, dpi=150)
-        plt.close()
-
-        # Embed plots into Excel
-        wb = load_workbook(save_path)
-        ws = wb.create_sheet("Plots")
-        ws.add_image(Image(plot_alpha_file), "B2")
-        ws.add_image(Image(plot_fixed_file), "B35")
-        ws.add_image(Image(plot_combined_file), "B68")
-        wb.save(save_path)
+        buf_alpha, buf_fixed, buf_combined = save_plots(
+            (plot_alpha_file, plot_fixed_file, plot_combined_file))
+
+        # Write data, fit results and the embedded plots in a single pass
+        with xlsxwriter.Workbook(save_path) as workbook:
+            write_sheet(workbook.add_worksheet("Data"), data_rows)
+            write_sheet(workbook.add_worksheet("FitResults"), fit_rows)
+            ws = workbook.add_worksheet("Plots")
+            ws.insert_image("B2", plot_alpha_file, {"image_data": buf_alpha})
+            ws.insert_image("B35", plot_fixed_file, {"image_data": buf_fixed})
+            ws.insert_image("B68", plot_combined_file, {"image_data": buf_combined})
         print(f"📁 Results saved with plots to {save_path}")
     else:
         print("❌ Save cancelled.")
@@ -36,9 +36,49 @@ Intended Use:
 
 import os
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 import tkinter as tk
 from tkinter import filedialog
 
+# In-kernel copy (Linux, Python 3.8+); on Btrfs/XFS this can share extents (reflink)
+# instead of duplicating the data
+COPY_FILE_RANGE = getattr(os, "copy_file_range", None)
+
+
+def copy_file(src, dst):
+    """Copy the contents of src to dst, in the kernel where possible."""
+    if COPY_FILE_RANGE is not None:
+        try:
+            with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                remaining = os.fstat(fsrc.fileno()).st_size
+                while remaining > 0:
+                    copied = COPY_FILE_RANGE(fsrc.fileno(), fdst.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+            if remaining <= 0:
+                return
+        except OSError:
+            pass  # e.g. unsupported filesystem or cross-device copy on older kernels
+    shutil.copyfile(src, dst)
+
+
+def copy_folder(job):
+    """Copy one folder's DCM files into its "new" subfolder under their new names."""
+    current_path, dcm_files, new_names = job
+
+    # Create output folder
+    output_folder = os.path.join(current_path, "new")
+    os.makedirs(output_folder, exist_ok=True)
+
+    # Rename and copy (contents only, no copystat: timestamps/permissions are not needed)
+    src_prefix = current_path + os.sep
+    dst_prefix = output_folder + os.sep
+    for old_file, new_name in zip(dcm_files, new_names):
+        copy_file(src_prefix + old_file, f"{dst_prefix}{new_name}.dcm")
+
+    return current_path
+
 # ---------- SELECT ROOT FOLDER ----------
 root = tk.Tk()
 root.withdraw()
@@ -52,12 +92,23 @@ if not root_folder:
 
 processed_folders = []
 skipped_folders = []
+jobs = []
 
 # ---------- WALK THROUGH SUBFOLDERS ----------
-for current_path, _, files in os.walk(root_folder):
-
-    dcm_files = sorted([f for f in files if f.lower().endswith(".dcm")])
-    txt_files = [f for f in files if f.lower().endswith(".txt")]
+for current_path, dirs, files in os.walk(root_folder):
+    # Don't descend into "new" output folders left by earlier runs
+    dirs[:] = [d for d in dirs if d != "new"]
+
+    # Classify the files in one pass
+    dcm_files = []
+    txt_files = []
+    for f in files:
+        ext = f[-4:].lower()
+        if ext == ".dcm":
+            dcm_files.append(f)
+        elif ext == ".txt":
+            txt_files.append(f)
+    dcm_files.sort()
 
     # Require at least one DCM and exactly one TXT
     if not dcm_files or len(txt_files) != 1:
@@ -75,19 +126,14 @@ for current_path, _, files in os.walk(root_folder):
         skipped_folders.append((current_path, "DCM/TXT count mismatch"))
         continue
 
-    # Create output folder
-    output_folder = os.path.join(current_path, "new")
-    os.makedirs(output_folder, exist_ok=True)
-
-    # Rename and copy
-    for old_file, new_name in zip(dcm_files, new_names):
-        old_path = os.path.join(current_path, old_file)
-        new_filename = f"{new_name}.dcm"
-        new_path = os.path.join(output_folder, new_filename)
-
-        shutil.copy2(old_path, new_path)
+    jobs.append((current_path, dcm_files, new_names))
 
-    processed_folders.append(current_path)
+# ---------- RENAME AND COPY ----------
+# Folders are independent and the copies are I/O-bound, so they run on a thread pool;
+# map keeps the processed folders in walk order
+if jobs:
+    with ThreadPoolExecutor(max_workers=min(32, len(jobs))) as executor:
+        processed_folders.extend(executor.map(copy_folder, jobs))
 
 # ---------- CONSOLE REPORT ----------
 print("\n===== SCRIPT SUMMARY =====\n")